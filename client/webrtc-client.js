@@ -20,6 +20,17 @@ const rtcConfig = {
   ],
 };
 
+// Coordinates are sent as 9 bytes: tag 1, then x and y as little-endian int32
+const COORDS_TAG = 1;
+
+function encodeCoords(x, y) {
+  const view = new DataView(new ArrayBuffer(9));
+  view.setUint8(0, COORDS_TAG);
+  view.setInt32(1, x, true);
+  view.setInt32(5, y, true);
+  return new Uint8Array(view.buffer);
+}
+
 // Flag to only show error feedback message once
 let errorFeedbackLogged = false;
 
@@ -352,14 +363,8 @@ async function connect() {
                       .createUnidirectionalStream()
                       .then((stream) => {
                         const writer = stream.getWriter();
-                        const message = JSON.stringify({
-                          type: "coords",
-                          x: pos.x,
-                          y: pos.y,
-                        });
-
                         writer
-                          .write(new TextEncoder().encode(message))
+                          .write(encodeCoords(pos.x, pos.y))
                           .then(() => writer.close())
                           .catch((err) =>
                             console.error(`Error sending coordinates: ${err}`)
@@ -602,26 +607,30 @@ async function handleIncomingStreams(incomingStream) {
       const reader = stream.getReader();
       const { value: response } = await reader.read();
       const decoder = new TextDecoder();
-      const data = JSON.parse(decoder.decode(response));
-
-      if (data.type === "answer") {
-        log("Got SDP answer from server");
-        if (peerConnection) {
-          await peerConnection.setRemoteDescription(
-            new RTCSessionDescription(data)
-          );
-          log("Remote description set");
+      const payload = JSON.parse(decoder.decode(response));
+      // Messages the server sends together arrive as one JSON array
+      const messages = Array.isArray(payload) ? payload : [payload];
+
+      for (const data of messages) {
+        if (data.type === "answer") {
+          log("Got SDP answer from server");
+          if (peerConnection) {
+            await peerConnection.setRemoteDescription(
+              new RTCSessionDescription(data)
+            );
+            log("Remote description set");
+          } else {
+            log("PeerConnection is closed/null, skipping setRemoteDescription");
+          }
+        } else if (data.type === "error") {
+          if (!errorFeedbackLogged) {
+            log("Server will show ball detection errors below video");
+            errorFeedbackLogged = true;
+          }
+          displayError(data.error, data);
         } else {
-          log("PeerConnection is closed/null, skipping setRemoteDescription");
-        }
-      } else if (data.type === "error") {
-        if (!errorFeedbackLogged) {
-          log("Server will show ball detection errors below video");
-          errorFeedbackLogged = true;
+          log(`Unknown message: ${data.type}`);
         }
-        displayError(data.error, data);
-      } else {
-        log(`Unknown message: ${data.type}`);
       }
     }
   } catch (error) {
@@ -1,6 +1,7 @@
 from server.main import main
 import asyncio
+import uvloop
 
 if __name__ == "__main__":
+    uvloop.install()
     asyncio.run(main())
-                                                                                                                                                                                            
\ No newline at end of file
@@ -1,43 +1,181 @@
-# This file generates bouncing ball frames in a separate thread
+# This file generates bouncing ball frames in an asyncio task
 
-import threading
-import time
+import asyncio
+import types
 import numpy as np
-from PIL import Image, ImageDraw
-from queue import Queue
+import cv2
+from numba import njit
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+@njit(cache=True)
+def _ball_box(cx, cy, r, h, w):
+    return max(cy - r, 0), min(cy + r + 1, h), max(cx - r, 0), min(cx + r + 1, w)
+
+
+@njit(cache=True)
+def _fill_circle(frame, cx, cy, r, value):
+    # Integer midpoint fill: walk rows outward from the center, shrinking the
+    # half-width while dx*dx + dy*dy exceeds r*r, and fill each row as one span
+    h, w = frame.shape[0], frame.shape[1]
+    dx = r
+    for dy in range(r + 1):
+        while dx * dx + dy * dy > r * r:
+            dx -= 1
+        x0, x1 = max(cx - dx, 0), min(cx + dx + 1, w)
+        for y in (cy - dy, cy + dy):
+            if 0 <= y < h:
+                frame[y, x0:x1] = value
+
+
+@njit(cache=True, fastmath=True)
+def _stamp(frame, sprite, mask, cx, cy, r):
+    # Copy the ball sprite centered at (cx, cy), clipped to the frame
+    y0, y1, x0, x1 = _ball_box(cx, cy, r, frame.shape[0], frame.shape[1])
+    oy, ox = y0 - (cy - r), x0 - (cx - r)
+    for i in range(y1 - y0):
+        for j in range(x1 - x0):
+            if mask[oy + i, ox + j]:
+                for c in range(frame.shape[2]):
+                    frame[y0 + i, x0 + j, c] = sprite[oy + i, ox + j, c]
+
+
+@njit(cache=True, fastmath=True)
+def _tick(frame, background, sprite, mask, drawn, state, r):
+    # state rows are (x, y, vx, vy) per ball, drawn rows the last drawn (x, y)
+    h, w = frame.shape[0], frame.shape[1]
+
+    # Erase every ball from where it was drawn last frame
+    for k in range(state.shape[0]):
+        y0, y1, x0, x1 = _ball_box(drawn[k, 0], drawn[k, 1], r, h, w)
+        frame[y0:y1, x0:x1] = background[y0:y1, x0:x1]
+
+    for k in range(state.shape[0]):
+        # Move ball
+        state[k, 0] += state[k, 2]
+        state[k, 1] += state[k, 3]
+
+        # Bounce off edges
+        if state[k, 0] - r <= 0 or state[k, 0] + r >= w:
+            state[k, 2] = -state[k, 2]
+        if state[k, 1] - r <= 0 or state[k, 1] + r >= h:
+            state[k, 3] = -state[k, 3]
+
+        # Keep ball on screen
+        state[k, 0] = max(r, min(w - r, state[k, 0]))
+        state[k, 1] = max(r, min(h - r, state[k, 1]))
+
+        _stamp(frame, sprite, mask, state[k, 0], state[k, 1], r)
+        drawn[k, 0] = state[k, 0]
+        drawn[k, 1] = state[k, 1]
+
+
 class BallGenerator:
 
-    def __init__(self, width=640, height=480, fps=30):  
+    # Fixed attribute layout; the frame loop reads several of these every tick
+    __slots__ = (
+        'width', 'height', 'fps', 'pixel_format', 'running', 'frame_count',
+        'ball_radius', 'background_color', 'ball_color',
+        '_task', '_latest_frame', '_state', '_drawn', '_dirty',
+        '_background', '_frame', '_sprite', '_mask', '_fallback_frame',
+        '_buffers', '_outputs', '_back',
+        '_stats', '_stats_view',
+    )
+
+    def __init__(self, width=640, height=480, fps=30, pixel_format='rgb24'):  
+        if pixel_format not in ('rgb24', 'yuv420p'):
+            raise ValueError(f"Unsupported pixel format: {pixel_format}")
+        if pixel_format == 'yuv420p' and (width % 2 or height % 2):
+            raise ValueError("yuv420p frames need an even width and height")
+
         self.width = width
         self.height = height
         self.fps = fps
-        self.frame_queue = Queue(maxsize=60)
+        self.pixel_format = pixel_format
+        self._latest_frame = None  # Consumers only ever want the newest frame
         self.running = False
-        self.thread = None
+        self._task = None
         self.frame_count = 0
         
-        # Ball starting position and movement
-        self.ball_x = width // 2
-        self.ball_y = height // 2
-        self.ball_vx = 2
-        self.ball_vy = 1
+        # Ball starting position and movement, one (x, y, vx, vy) row per ball
+        self._state = np.array([[width // 2, height // 2, 2, 1]], dtype=np.int32)
         self.ball_radius = 25
         
         self.background_color = (50, 50, 50)
         self.ball_color = (0, 255, 0)
+
+        # Frames are drawn into reused canvases; only the ball area is
+        # restored from the background template each frame
+        self._background = np.full((height, width, 3), self.background_color, dtype=np.uint8)
+        self._rebuild_sprite()
+
+        # Published frames alternate between two bytearray-backed buffers: the
+        # generator writes the one consumers are not holding, then flips to it.
+        # yuv420p is what the video encoders consume and is half the size of
+        # rgb24, so in that mode the buffers hold I420 converted from a single
+        # RGB canvas; in rgb24 mode each buffer is itself a canvas.
+        if pixel_format == 'yuv420p':
+            shape = (height * 3 // 2, width)
+            self._frame = self._background.copy()
+        else:
+            shape = (height, width, 3)
+            self._frame = None
+        self._buffers = (bytearray(int(np.prod(shape))), bytearray(int(np.prod(shape))))
+        self._outputs = tuple(np.frombuffer(buf, dtype=np.uint8).reshape(shape) for buf in self._buffers)
+        if self._frame is None:
+            for out in self._outputs:
+                out[:] = self._background
+        self._drawn = [self._state[:, :2].copy() for _ in self._outputs]
+        self._back = 0
+
+        # Centered ball shown when no generated frame is available yet
+        self._fallback_frame = self._background.copy()
+        _stamp(self._fallback_frame, self._sprite, self._mask, width // 2, height // 2, self.ball_radius)
+        if pixel_format == 'yuv420p':
+            self._fallback_frame = cv2.cvtColor(self._fallback_frame, cv2.COLOR_RGB2YUV_I420)
+        
+        self._stats = {
+            'fps': fps,
+            'queue_size': 0,
+            'ball_pos': self.ball_pos,
+            'ball_vel': (self.ball_vx, self.ball_vy),
+            'ball_radius': self.ball_radius,
+            'resolution': (width, height),
+            'running': False,
+            'frames_generated': 0
+        }
+        self._stats_view = types.MappingProxyType(self._stats)
         
-        logger.debug(f"BallGenerator initialized: {width}x{height} @ {self.fps}fps")
+        logger.debug("BallGenerator initialized: %dx%d @ %sfps", width, height, fps)
         
+    @property
+    def ball_pos(self):
+        x, y = self._state[0, :2].tolist()
+        return x, y
+
+    @property
+    def ball_x(self):
+        return int(self._state[0, 0])
+
+    @property
+    def ball_y(self):
+        return int(self._state[0, 1])
+
+    @property
+    def ball_vx(self):
+        return int(self._state[0, 2])
+
+    @property
+    def ball_vy(self):
+        return int(self._state[0, 3])
+
     def start(self):
         
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._generate_frames, daemon=True)
-            self.thread.start()
+            self._task = asyncio.get_running_loop().create_task(self._generate_frames())
             logger.info(f"Ball generator started at {self.fps} FPS")
         else:
             # logger.debug("Ball generator already running")
@@ -45,94 +183,85 @@ class BallGenerator:
     
     def stop(self):
         self.running = False
-        if self.thread:
-            self.thread.join(timeout=1.0)
+        if self._task:
+            self._task.cancel()
+            self._task = None
         logger.info("Ball generator stopped")
     
     def set_fps(self, fps):
         self.fps = fps
         logger.info(f"Frame rate changed to {self.fps} FPS")
     
-    def _generate_frames(self):
+    async def _generate_frames(self):
         
-        logger.debug("Ball generator thread started")
+        logger.debug("Ball generator task started")
+        loop = asyncio.get_running_loop()
         frame_time = 1.0 / self.fps
+        next_deadline = loop.time()
         
-        while self.running:
-            start_time = time.time()
-            
-            frame = self._create_frame()
-            self.frame_count += 1
-            
-            # Manage queue size
-            if self.frame_queue.qsize() >= 25:
-                try:
-                    self.frame_queue.get_nowait()
-                except:
-                    pass
-            
-            try:
-                self.frame_queue.put_nowait(frame)
-            except:
-                pass
-            
-            # Control frame rate
-            elapsed = time.time() - start_time
-            if elapsed < frame_time:
-                time.sleep(frame_time - elapsed)
-        
-        logger.debug("Ball generator thread stopped")
+        try:
+            while self.running:
+                # A stationary ball with nothing else changed renders the same
+                # frame again, so keep publishing the previous one
+                if self._dirty or self._state[:, 2:].any():
+                    self._latest_frame = self._create_frame()
+                    self.frame_count += 1
+                    self._dirty = False
+                
+                # Control frame rate against a fixed schedule so sleep error does not accumulate
+                next_deadline += frame_time
+                delay = next_deadline - loop.time()
+                if delay < -frame_time:
+                    # Fell behind by more than a frame, resync instead of bursting
+                    next_deadline = loop.time()
+                # Always yield so a slow frame never starves the event loop
+                await asyncio.sleep(max(delay, 0))
+        finally:
+            logger.debug("Ball generator task stopped")
     
-    def _create_frame(self):
-        # Create a PIL image with the background color
-        img = Image.new('RGB', (self.width, self.height), self.background_color)
-        draw = ImageDraw.Draw(img)
-
-        # Move ball
-        self.ball_x += self.ball_vx
-        self.ball_y += self.ball_vy
-
-        # Bounce off edges
-        if self.ball_x - self.ball_radius <= 0 or self.ball_x + self.ball_radius >= self.width:
-            self.ball_vx = -self.ball_vx
-        if self.ball_y - self.ball_radius <= 0 or self.ball_y + self.ball_radius >= self.height:
-            self.ball_vy = -self.ball_vy
+    def _rebuild_sprite(self):
+        # Rasterize the ball once; frames only copy it into place
+        self._dirty = True
+        r = self.ball_radius
+        self._mask = np.zeros((2 * r + 1, 2 * r + 1), dtype=np.bool_)
+        _fill_circle(self._mask, r, r, r, True)
+        self._sprite = np.zeros((2 * r + 1, 2 * r + 1, 3), dtype=np.uint8)
+        self._sprite[self._mask] = self.ball_color
 
-        # Keep ball on screen
-        self.ball_x = max(self.ball_radius, min(self.width - self.ball_radius, self.ball_x))
-        self.ball_y = max(self.ball_radius, min(self.height - self.ball_radius, self.ball_y))
-
-        # Draw the ball
-        left_up = (int(self.ball_x - self.ball_radius), int(self.ball_y - self.ball_radius))
-        right_down = (int(self.ball_x + self.ball_radius), int(self.ball_y + self.ball_radius))
-        draw.ellipse([left_up, right_down], fill=self.ball_color)
-
-        # Convert PIL image to numpy array
-        frame = np.array(img)
-        return frame
+    def _create_frame(self):
+        # Render into the buffer consumers are not holding, then flip to it
+        back = self._back
+        self._back = 1 - back
+        out = self._outputs[back]
+        if self._frame is not None:
+            _tick(self._frame, self._background, self._sprite, self._mask,
+                  self._drawn[0], self._state, self.ball_radius)
+            cv2.cvtColor(self._frame, cv2.COLOR_RGB2YUV_I420, dst=out)
+        else:
+            _tick(out, self._background, self._sprite, self._mask,
+                  self._drawn[back], self._state, self.ball_radius)
+        return out
     
     def get_frame(self):
-        try:
-            frame = self.frame_queue.get_nowait()
-            return frame
-        except:
-            # Create a simple frame if queue is empty
-            img = Image.new('RGB', (self.width, self.height), self.background_color)
-            draw = ImageDraw.Draw(img)
-            left_up = (self.width // 2 - self.ball_radius, self.height // 2 - self.ball_radius)
-            right_down = (self.width // 2 + self.ball_radius, self.height // 2 + self.ball_radius)
-            draw.ellipse([left_up, right_down], fill=self.ball_color)
-            fallback_frame = np.array(img)
-            return fallback_frame
+        frame = self._latest_frame
+        if frame is None:
+            # Use the centered ball frame until the first frame is generated
+            return self._fallback_frame
+        return frame
     
     def get_stats(self):
-        return {
-            'fps': self.fps,
-            'queue_size': self.frame_queue.qsize(),
-            'ball_pos': (self.ball_x, self.ball_y),
-            'ball_vel': (self.ball_vx, self.ball_vy),
-            'ball_radius': self.ball_radius,
-            'resolution': (self.width, self.height),
-            'running': self.running,
-            'frames_generated': self.frame_count
-        } 
\ No newline at end of file
+        # Refresh the changing fields of one dict instead of building a new one
+        stats = self._stats
+        stats['fps'] = self.fps
+        stats['queue_size'] = int(self._latest_frame is not None)
+        stats['ball_pos'] = self.ball_pos
+        stats['ball_vel'] = (self.ball_vx, self.ball_vy)
+        stats['running'] = self.running
+        stats['frames_generated'] = self.frame_count
+        return self._stats_view
+
+
+def warm_up():
+    # Compile (or load from the on-disk cache) every frame kernel before the
+    # first session needs them, so a first frame never stalls the event loop
+    BallGenerator(pixel_format='yuv420p')._create_frame()
@@ -5,10 +5,14 @@ import sys
 import os
 import argparse
 import signal
+import traceback
 
+import cv2
+import uvloop
 from aioquic.asyncio import serve
 from aioquic.quic.configuration import QuicConfiguration
 
+from .ball_generator import warm_up
 from .webrtc_handler import WebTransportProtocol
 
 logging.basicConfig(
@@ -22,6 +26,11 @@ logging.getLogger('quic').setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# Frames are small (640x480, one ball), so OpenCV's worker pool costs more
+# than it saves and would only compete with the event loop thread
+cv2.setUseOptimized(True)
+cv2.setNumThreads(1)
+
 async def main():
     parser = argparse.ArgumentParser(description='WebTransport server')
     parser.add_argument('--cert', type=str, required=True)
@@ -53,6 +62,7 @@ async def main():
     host = args.host
     port = args.port
     
+    warm_up()
     logger.info(f"Starting server on {host}:{port}")
     
     stop_event = asyncio.Event()
@@ -80,23 +90,25 @@ async def main():
 
         await stop_event.wait()
         logger.info("Shutting down...")
+
+        # aioquic has no public view of live connections, and close() clears
+        # the cid -> protocol map, so snapshot the protocols first
+        protocols = set(server._protocols.values())
         server.close()
- 
-        for protocol in list(server._protocols):
-            handler = getattr(protocol, '_handler', None)
-            if handler and hasattr(handler, 'cleanup'):
-                await handler.cleanup()
 
-        await asyncio.sleep(0.5)
+        handlers = [p._handler for p in protocols if getattr(p, '_handler', None)]
+        await asyncio.gather(*(h.cleanup() for h in handlers), return_exceptions=True)
         
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
     except Exception as e:
         logger.error(f"Server error: {e}")
-        import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
+    # The server is all event-loop work (QUIC datagrams, small callbacks and
+    # tasks), which libuv's loop runs faster than the default one
+    uvloop.install()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
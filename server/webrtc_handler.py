@@ -1,13 +1,18 @@
 import asyncio
-import json
 import logging
+import orjson
+import re
+import struct
 from typing import Optional
 import aiortc
 from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack, RTCConfiguration, RTCIceServer
 from av import VideoFrame
+from av.video.frame import PictureType
 import fractions
+from math import hypot
+import cv2
 import numpy as np
-import time
+import traceback
 
 from aioquic.asyncio import QuicConnectionProtocol
 from aioquic.h3.connection import H3Connection
@@ -15,10 +20,43 @@ from aioquic.h3.events import HeadersReceived, WebTransportStreamDataReceived, H
 from aioquic.quic.events import QuicEvent, ProtocolNegotiated, StreamReset
 
 from .ball_generator import BallGenerator
-from PIL import Image, ImageDraw
 
 logger = logging.getLogger(__name__)
 
+# The answer envelope never changes, only the SDP inside it
+_ANSWER_PREFIX = b'{"type":"answer","sdp":'
+_ANSWER_SUFFIX = b'}'
+
+# Coords arrive as a tag byte and two little-endian int32s instead of JSON;
+# the tag can never start a JSON document
+_COORDS = struct.Struct('<Bii')
+_COORDS_TAG = 1
+
+_ICE_UFRAG = re.compile(r'^a=ice-ufrag:(\S+)', re.MULTILINE)
+
+# The track sends frames at this rate and the generator renders at the same
+# rate, so every rendered frame is sent and none are rendered just to be dropped
+_VIDEO_FPS = 10
+_VIDEO_TIME_BASE = fractions.Fraction(1, _VIDEO_FPS)
+
+
+def _ice_ufrag(sdp):
+    # A peer connection keeps its ICE credentials across renegotiations
+    match = _ICE_UFRAG.search(sdp)
+    return match.group(1) if match else None
+
+
+def _split_planes(frame, pixel_format):
+    # View a packed frame as the rows of bytes of each VideoFrame plane
+    if pixel_format == 'yuv420p':
+        h, w = frame.shape[0] * 2 // 3, frame.shape[1]
+        u_end = h + h // 4
+        return (frame[:h],
+                frame[h:u_end].reshape(h // 2, w // 2),
+                frame[u_end:].reshape(h // 2, w // 2))
+    return (frame.reshape(frame.shape[0], -1),)
+
+
 class WebTransportProtocol(QuicConnectionProtocol):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -32,18 +70,29 @@ class WebTransportProtocol(QuicConnectionProtocol):
             self._handler.stream_closed(event.stream_id)
         
         if self._http is not None:
-            for h3_event in self._http.handle_event(event):
-                self._h3_event_received(h3_event)
+            # One QUIC event can yield a burst of H3 events; bind the dispatch once
+            h3_events = self._http.handle_event(event)
+            if h3_events:
+                dispatch = self._h3_event_received
+                for h3_event in h3_events:
+                    dispatch(h3_event)
     
     def _h3_event_received(self, event: H3Event) -> None:
         if not self._http:
             return
             
         if isinstance(event, HeadersReceived):
-            headers = dict(event.headers)
-            method = headers.get(b":method")
-            protocol = headers.get(b":protocol")
-            path = headers.get(b":path")
+            # Only three pseudo-headers matter, so pick them out in one pass
+            method = protocol = path = None
+            for name, value in event.headers:
+                if name == b":method":
+                    method = value
+                elif name == b":protocol":
+                    protocol = value
+                elif name == b":path":
+                    path = value
+                if method and protocol and path:
+                    break
 
             if method == b"CONNECT" and protocol == b"webtransport" and path == b"/connection":
                 logger.info("WebTransport connection accepted")
@@ -55,8 +104,6 @@ class WebTransportProtocol(QuicConnectionProtocol):
                         (b"sec-webtransport-http3-draft", b"draft02"),
                     ]
                 )
-        elif isinstance(event, WebTransportStreamDataReceived):
-            pass
         
         if self._handler:
             self._handler.h3_event_received(event)
@@ -68,11 +115,11 @@ class WebRtcHandler:
         self._stream_buffers = {}
         self.peer_connection = None
         self.ball_generator = None
-        self.video_task = None
+        self.video_streaming = False
         self._tasks = set()  # Track all created asyncio tasks
-        self._video_stream_lock = asyncio.Lock()
+        self._outgoing = []  # Pieces of the next batched send
         self._state_lock = asyncio.Lock()  # New lock for shared state
-        self._offer_in_progress = False  # Track if an SDP offer is being processed
+        self._offer_lock = asyncio.Lock()  # Held while an SDP offer is being processed
         
         # Configure ICE servers for the server
         self.ice_servers = [
@@ -85,151 +132,176 @@ class WebRtcHandler:
         logger.info(f"WebRtcHandler initialized for session: {session_id}")
     
     def h3_event_received(self, event):
-        if hasattr(event, 'stream_id') and hasattr(event, 'data') and hasattr(event, 'stream_ended'):
-            # Handle unidirectional stream data (SDP offer or coords)
-            # Lock for _stream_buffers
-            async def handle_stream():
-                async with self._state_lock:
-                    if event.stream_id not in self._stream_buffers:
-                        self._stream_buffers[event.stream_id] = bytearray()
-                    if event.data:
-                        self._stream_buffers[event.stream_id].extend(event.data)
-                    if event.stream_ended:
-                        logger.info(f"Stream {event.stream_id} ended, processing message")
-                        data = bytes(self._stream_buffers[event.stream_id])
-                        try:
-                            message = json.loads(data.decode())
-                            message_type = message.get('type', 'unknown')
-                            if message_type == 'offer':
-                                logger.info("Processing SDP offer")
-                                task = asyncio.create_task(self.handle_sdp_offer(data))
-                                self._tasks.add(task)
-                                task.add_done_callback(self._tasks.discard)
-                            elif message_type == 'coords':
-                                task = asyncio.create_task(self.handle_client_coords(message))
-                                self._tasks.add(task)
-                                task.add_done_callback(self._tasks.discard)
-                            else:
-                                logger.warning(f"Unknown message type: {message_type}")
-                        except json.JSONDecodeError:
-                            logger.error("Failed to parse message as JSON")
-                        except Exception as e:
-                            logger.error(f"Error processing message: {e}")
-                        del self._stream_buffers[event.stream_id]
-            asyncio.create_task(handle_stream())
-        else:
-            if self._handler:
-                self._handler.h3_event_received(event)
+        if isinstance(event, WebTransportStreamDataReceived):
+            # Handle unidirectional stream data (SDP offer or coords). The event
+            # loop runs this to completion, so the buffers need no lock and
+            # only work that actually awaits gets a task
+            chunks = self._stream_buffers.get(event.stream_id)
+            if event.stream_ended:
+                logger.debug("Stream %d ended, processing message", event.stream_id)
+                if chunks is None:
+                    # Most messages arrive whole in one event and never need a buffer
+                    self._handle_message(event.data)
+                    return
+                del self._stream_buffers[event.stream_id]
+                chunks.append(event.data)
+                self._handle_message(b''.join(chunks))
+            elif event.data:
+                if chunks is None:
+                    self._stream_buffers[event.stream_id] = [event.data]
+                else:
+                    chunks.append(event.data)
     
+    def _handle_message(self, data: bytes):
+        if len(data) == _COORDS.size and data[0] == _COORDS_TAG:
+            _, x, y = _COORDS.unpack(data)
+            self.handle_client_coords({'x': x, 'y': y})
+            return
+        try:
+            message = orjson.loads(data)
+            message_type = message.get('type', 'unknown')
+            if message_type == 'offer':
+                logger.info("Processing SDP offer")
+                task = asyncio.create_task(self.handle_sdp_offer(data))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            elif message_type == 'coords':
+                # A few arithmetic ops and one send, not worth a task
+                self.handle_client_coords(message)
+            else:
+                logger.warning(f"Unknown message type: {message_type}")
+        except orjson.JSONDecodeError:
+            logger.error("Failed to parse message as JSON")
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+
+    def _send_message(self, data: bytes):
+        # Encoded messages queued during one loop iteration go out together on
+        # one stream; the pieces of the JSON array are kept so a single join
+        # builds the payload, which aioquic then copies into its send buffer
+        outgoing = self._outgoing
+        if outgoing:
+            outgoing.append(b',')
+        else:
+            outgoing.append(b'[')
+            asyncio.get_running_loop().call_soon(self._flush_outgoing)
+        outgoing.append(data)
+
+    def _flush_outgoing(self):
+        parts, self._outgoing = self._outgoing, []
+        parts.append(b']')
+        try:
+            stream_id = self._http.create_webtransport_stream(
+                self._session_id,
+                is_unidirectional=True
+            )
+            self._http._quic.send_stream_data(stream_id, b''.join(parts), end_stream=True)
+        except Exception as e:
+            logger.error(f"Failed to send {len(parts) // 2} message(s): {e}")
+
     def stream_closed(self, stream_id: int):
-        # No longer delete the buffer here; let the handler task in h3_event_received handle cleanup after processing
-        pass
+        # Drop whatever a reset stream left half received
+        self._stream_buffers.pop(stream_id, None)
     
     async def handle_sdp_offer(self, raw_data: bytes):
-        async with self._state_lock:
-            if self._offer_in_progress:
-                logger.warning("SDP offer received while another is in progress. Ignoring this offer.")
-                return
-            # Check if there's already an active peer connection
-            if self.peer_connection and self.peer_connection.connectionState != "closed":
-                logger.warning("SDP offer received while peer connection is still active. Closing existing connection.")
-                try:
-                    await self.peer_connection.close()
-                except Exception as e:
-                    logger.error(f"Error closing existing peer connection: {e}")
-            self._offer_in_progress = True
-        try:
-            data = json.loads(raw_data.decode())
-            logger.info(f"Processing SDP offer")
-            if 'type' not in data or 'sdp' not in data:
-                logger.error("Invalid SDP offer format")
-                return
-            # Create RTCPeerConnection with ICE configuration
-            offer = RTCSessionDescription(sdp=data['sdp'], type=data['type'])
-            # Configure RTCPeerConnection with ICE settings
-            pc = RTCPeerConnection(configuration=self.rtc_config)
-            self.peer_connection = pc
-            # Set up event handlers
-            @pc.on("connectionstatechange")
-            async def on_connectionstatechange():
-                try:
-                    logger.info(f"Connection state: {pc.connectionState}")
-                    if pc.connectionState == "connected":
-                        logger.info("WebRTC connection established")
-                        await self.start_video_stream()
-                    elif pc.connectionState in ["failed", "closed"]:
-                        logger.info("WebRTC connection closed")
-                        await self.stop_video_stream()
-                        try:
-                            await pc.close()
-                        except Exception as e:
-                            logger.error(f"Error closing peer connection: {e}")
-                except Exception as e:
-                    logger.error(f"Error in connection state change handler: {e}")
-            @pc.on("iceconnectionstatechange")
-            async def on_iceconnectionstatechange():
-                try:
-                    if pc.iceConnectionState == "connected":
-                        logger.info("ICE connection established")
-                        await self.start_video_stream()
-                    elif pc.iceConnectionState == "failed":
-                        logger.error("ICE connection failed")
-                        await self.stop_video_stream()
-                    elif pc.iceConnectionState == "checking":
-                        logger.info("ICE checking...")
-                    elif pc.iceConnectionState == "closed":
-                        logger.info("ICE connection closed")
-                        await self.stop_video_stream()
-                except Exception as e:
-                    logger.error(f"Error in ICE connection state change handler: {e}")
-            @pc.on("track")
-            async def on_track(track: MediaStreamTrack):
-                try:
-                    if track.kind == "video":
-                        logger.info("Video track received")
-                except Exception as e:
-                    logger.error(f"Error in track handler: {e}")
-            # Set remote description (the offer)
-            await pc.setRemoteDescription(offer)
-            logger.info("Remote description set")
-            # Add video track BEFORE creating answer to ensure ICE candidates are generated
-            self.ball_generator = BallGenerator(width=640, height=480, fps=10)
-            self.ball_generator.start()
-            video_track = BallVideoTrack(self.ball_generator)
-            pc.addTrack(video_track)
-            logger.info("Video track added to peer connection")
-            # Create answer
-            answer = await pc.createAnswer()
-            await pc.setLocalDescription(answer)
-            logger.info("Local description set")
-            # Wait for ICE gathering to complete
-            await self._wait_for_ice_gathering(pc)
-            # Get the final answer with all candidates embedded
-            final_answer = pc.localDescription
-            logger.info("SDP answer created with all ICE candidates embedded")
-            # Send answer back via WebTransport
-            answer_message = {
-                'type': 'answer',
-                'sdp': final_answer.sdp
-            }
-            # Create a new unidirectional stream to send the answer
+        # One lock covers the whole negotiation; an offer arriving meanwhile is dropped
+        if self._offer_lock.locked():
+            logger.warning("SDP offer received while another is in progress. Ignoring this offer.")
+            return
+        async with self._offer_lock:
             try:
-                stream_id = self._http.create_webtransport_stream(
-                    self._session_id, 
-                    is_unidirectional=True
-                )
-                answer_data = json.dumps(answer_message).encode()
-                self._http._quic.send_stream_data(stream_id, answer_data, end_stream=True)
-                logger.info("SDP answer sent")
+                data = orjson.loads(raw_data)
+                logger.info(f"Processing SDP offer")
+                if 'type' not in data or 'sdp' not in data:
+                    logger.error("Invalid SDP offer format")
+                    return
+                offer = RTCSessionDescription(sdp=data['sdp'], type=data['type'])
+                pc = self.peer_connection
+                if (pc is not None and pc.connectionState not in ("failed", "closed")
+                        and pc.remoteDescription is not None
+                        and _ice_ufrag(pc.remoteDescription.sdp) == _ice_ufrag(offer.sdp)):
+                    # Same remote peer renegotiating, so keep its ICE and DTLS session
+                    logger.info("Renegotiating existing peer connection")
+                    await pc.setRemoteDescription(offer)
+                else:
+                    pc = await self._create_peer_connection(offer)
+                # Create answer
+                answer = await pc.createAnswer()
+                await pc.setLocalDescription(answer)
+                logger.info("Local description set")
+                # Wait for ICE gathering to complete
+                await self._wait_for_ice_gathering(pc)
+                # Get the final answer with all candidates embedded
+                final_answer = pc.localDescription
+                logger.info("SDP answer created with all ICE candidates embedded")
+                # Send answer back via WebTransport
+                self._send_message(b''.join((_ANSWER_PREFIX, orjson.dumps(final_answer.sdp), _ANSWER_SUFFIX)))
+                logger.info("SDP answer queued")
             except Exception as e:
-                logger.error(f"Failed to send SDP answer: {e}")
-        except Exception as e:
-            logger.error(f"Error handling SDP offer: {e}")
-            import traceback
-            traceback.print_exc()
-        finally:
-            async with self._state_lock:
-                self._offer_in_progress = False
+                logger.error(f"Error handling SDP offer: {e}")
+                traceback.print_exc()
+    
+    async def _create_peer_connection(self, offer):
+        # Check if there's already an active peer connection
+        if self.peer_connection and self.peer_connection.connectionState != "closed":
+            logger.warning("SDP offer received while peer connection is still active. Closing existing connection.")
+            try:
+                await self.peer_connection.close()
+            except Exception as e:
+                logger.error(f"Error closing existing peer connection: {e}")
+        # Configure RTCPeerConnection with ICE settings
+        pc = RTCPeerConnection(configuration=self.rtc_config)
+        self.peer_connection = pc
+        # Set up event handlers
+        @pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            try:
+                logger.info(f"Connection state: {pc.connectionState}")
+                if pc.connectionState == "connected":
+                    logger.info("WebRTC connection established")
+                    await self.start_video_stream()
+                elif pc.connectionState in ["failed", "closed"]:
+                    logger.info("WebRTC connection closed")
+                    await self.stop_video_stream()
+                    try:
+                        await pc.close()
+                    except Exception as e:
+                        logger.error(f"Error closing peer connection: {e}")
+            except Exception as e:
+                logger.error(f"Error in connection state change handler: {e}")
+        @pc.on("iceconnectionstatechange")
+        async def on_iceconnectionstatechange():
+            try:
+                if pc.iceConnectionState == "connected":
+                    logger.info("ICE connection established")
+                    await self.start_video_stream()
+                elif pc.iceConnectionState == "failed":
+                    logger.error("ICE connection failed")
+                    await self.stop_video_stream()
+                elif pc.iceConnectionState == "checking":
+                    logger.info("ICE checking...")
+                elif pc.iceConnectionState == "closed":
+                    logger.info("ICE connection closed")
+                    await self.stop_video_stream()
+            except Exception as e:
+                logger.error(f"Error in ICE connection state change handler: {e}")
+        @pc.on("track")
+        async def on_track(track: MediaStreamTrack):
+            try:
+                if track.kind == "video":
+                    logger.info("Video track received")
+            except Exception as e:
+                logger.error(f"Error in track handler: {e}")
+        # Set remote description (the offer)
+        await pc.setRemoteDescription(offer)
+        logger.info("Remote description set")
+        # Add video track BEFORE creating answer to ensure ICE candidates are generated
+        self.ball_generator = BallGenerator(width=640, height=480, fps=_VIDEO_FPS, pixel_format='yuv420p')
+        self.ball_generator.start()
+        video_track = BallVideoTrack(self.ball_generator)
+        pc.addTrack(video_track)
+        logger.info("Video track added to peer connection")
+        return pc
     
     async def _wait_for_ice_gathering(self, pc):
         if pc.iceGatheringState == 'complete':
@@ -237,41 +309,39 @@ class WebRtcHandler:
         
         logger.info("Waiting for ICE gathering to complete...")
         
-        # Wait for ICE gathering to complete
-        while pc.iceGatheringState != 'complete':
-            await asyncio.sleep(0.1)
+        # Wake up from aiortc's state change event instead of polling
+        gathered = asyncio.get_running_loop().create_future()
+
+        def on_icegatheringstatechange():
+            if pc.iceGatheringState == 'complete' and not gathered.done():
+                gathered.set_result(None)
+
+        pc.on("icegatheringstatechange", on_icegatheringstatechange)
+        try:
+            await gathered
+        finally:
+            pc.remove_listener("icegatheringstatechange", on_icegatheringstatechange)
         
         logger.info("ICE gathering completed")
     
+    # aiortc pulls frames from BallVideoTrack.recv itself, so streaming only
+    # tracks state here; there is no driver task to start or stop
     async def start_video_stream(self):
-        async with self._video_stream_lock:
-            if self.video_task is None:
-                self.video_task = asyncio.create_task(self._stream_video())
-                logger.info("Video streaming started")
+        if not self.video_streaming:
+            self.video_streaming = True
+            logger.info("Video streaming started")
     
     async def stop_video_stream(self):
-        async with self._video_stream_lock:
-            if self.video_task:
-                self.video_task.cancel()
-                self.video_task = None
-                logger.info("Video streaming stopped")
-            
-            if self.ball_generator:
-                self.ball_generator.stop()
-                self.ball_generator = None
-                logger.info("Ball generator stopped")
-    
-    async def _stream_video(self):
-        """Stream video frames"""
-        try:
-            while True:
-                await asyncio.sleep(0.1) 
-        except asyncio.CancelledError:
-            logger.info("Video streaming cancelled")
-        except Exception as e:
-            logger.error(f"Error in video streaming: {e}")
+        if self.video_streaming:
+            self.video_streaming = False
+            logger.info("Video streaming stopped")
+        
+        if self.ball_generator:
+            self.ball_generator.stop()
+            self.ball_generator = None
+            logger.info("Ball generator stopped")
 
-    async def handle_client_coords(self, message):
+    def handle_client_coords(self, message):
         try:
             x = message.get('x')
             y = message.get('y')
@@ -280,13 +350,13 @@ class WebRtcHandler:
                 logger.warning("Received coords missing x or y")
                 return
             # Get the true ball center from the ball generator
-            if self.ball_generator and self.ball_generator.running:
-                true_x = int(self.ball_generator.ball_x)
-                true_y = int(self.ball_generator.ball_y)
-                error = ((x - true_x) ** 2 + (y - true_y) ** 2) ** 0.5 # error: distance between client and true ball center
+            generator = self.ball_generator
+            if generator and generator.running:
+                true_x, true_y = generator.ball_pos
+                error = hypot(x - true_x, y - true_y) # error: distance between client and true ball center
                 logger.info(f"Error: {error:.2f} (client: ({x},{y}), true: ({true_x},{true_y}))")
             else:
-                error = None
+                error = true_x = true_y = None
                 logger.warning("Ball generator not running, cannot compute error")
             # Send error back to client
             error_message = {
@@ -294,17 +364,10 @@ class WebRtcHandler:
                 'error': error if error is not None else 'N/A',
                 'client_x': x,
                 'client_y': y,
-                'true_x': true_x if self.ball_generator and self.ball_generator.running else None,
-                'true_y': true_y if self.ball_generator and self.ball_generator.running else None
+                'true_x': true_x,
+                'true_y': true_y
             }
-            try:
-                stream_id = self._http.create_webtransport_stream(
-                    self._session_id,
-                    is_unidirectional=True
-                )
-                self._http._quic.send_stream_data(stream_id, json.dumps(error_message).encode(), end_stream=True)
-            except Exception as e:
-                logger.error(f"Failed to send error message: {e}")
+            self._send_message(orjson.dumps(error_message))
         except Exception as e:
             logger.error(f"Error in handle_client_coords: {e}")
 
@@ -342,37 +405,69 @@ class BallVideoTrack(MediaStreamTrack):
     def __init__(self, ball_generator):
         super().__init__()
         self.ball_generator = ball_generator
+        self.pixel_format = ball_generator.pixel_format
         self.frame_count = 0
-        self.start_time = time.time()
+        self.start_time = None  # Loop time of pts 0, taken on the first recv
+        self._next_pts = 0
+
+        # Blank frame used whenever the generator has nothing to give
+        self._blank_frame = np.full((480, 640, 3), 50, dtype=np.uint8)
+        yy, xx = np.ogrid[-20:21, -20:21]
+        self._blank_frame[220:261, 300:341][xx * xx + yy * yy <= 400] = (0, 255, 0)
+        if self.pixel_format == 'yuv420p':
+            self._blank_frame = cv2.cvtColor(self._blank_frame, cv2.COLOR_RGB2YUV_I420)
+        # Shared by every fallback path; PyAV copies it into each VideoFrame
+        self._blank_frame.setflags(write=False)
+
+        # One VideoFrame is refilled for every recv; aiortc encodes each frame
+        # before asking for the next one, so it is never read while rewritten
+        self._video_frame = VideoFrame(640, 480, self.pixel_format)
+        self._plane_rows = [np.frombuffer(plane, np.uint8).reshape(plane.height, plane.line_size)
+                            for plane in self._video_frame.planes]
+        self._filled = None  # Generator frame_count the VideoFrame currently holds
         logger.info("BallVideoTrack initialized")
     
     async def recv(self):
         try:
-            current_time = time.time()
-            frame_time = 1.0 / 10 
-            expected_frame = int((current_time - self.start_time) / frame_time)
+            # aiortc asks for the next frame as soon as the last one is encoded,
+            # so hold each frame until its slot on a fixed schedule
+            loop = asyncio.get_running_loop()
+            if self.start_time is None:
+                self.start_time = loop.time()
+            pts = self._next_pts
+            delay = self.start_time + pts / _VIDEO_FPS - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -1.0 / _VIDEO_FPS:
+                # Fell behind by more than a frame, skip ahead instead of bursting
+                pts = int((loop.time() - self.start_time) * _VIDEO_FPS)
+            self._next_pts = pts + 1
             
             # Check if ball generator is running and available
             if self.ball_generator and self.ball_generator.running:
                 frame = self.ball_generator.get_frame()
+                key = self.ball_generator.frame_count
             else:
                 frame = None
                 
             if frame is None:
-                # Create a blank frame if no frame available
-                img = Image.new('RGB', (640, 480), (50, 50, 50))
-                draw = ImageDraw.Draw(img)
-                left_up = (320 - 20, 240 - 20)
-                right_down = (320 + 20, 240 + 20)
-                draw.ellipse([left_up, right_down], fill=(0, 255, 0))
-                frame = np.array(img)
-            
-            # Convert frame to RGB if needed (Pillow already gives RGB)
-            frame_rgb = frame
+                frame = self._blank_frame
+                key = -1
 
-            video_frame = VideoFrame.from_ndarray(frame_rgb, format="rgb24")
-            video_frame.pts = expected_frame
-            video_frame.time_base = fractions.Fraction(1, 10) 
+            # When nothing new was published since the last call the VideoFrame
+            # already holds this frame, so only the timestamp changes
+            if key != self._filled:
+                # Frames are copied in the generator's own format, no conversion;
+                # plane rows may be padded so only the visible bytes are written
+                for rows, src in zip(self._plane_rows, _split_planes(frame, self.pixel_format)):
+                    rows[:, :src.shape[1]] = src
+                self._filled = key
+            video_frame = self._video_frame
+            video_frame.pts = pts
+            video_frame.time_base = _VIDEO_TIME_BASE
+            # Encoders mark forced keyframes on the frame itself; clear it so a
+            # single PLI does not turn every later frame into a keyframe
+            video_frame.pict_type = PictureType.NONE
             
             self.frame_count += 1
             return video_frame
@@ -380,15 +475,10 @@ class BallVideoTrack(MediaStreamTrack):
             logger.error(f"Error in BallVideoTrack.recv: {e}")
             # Return a fallback frame on error
             try:
-                img = Image.new('RGB', (640, 480), (50, 50, 50))
-                draw = ImageDraw.Draw(img)
-                left_up = (320 - 20, 240 - 20)
-                right_down = (320 + 20, 240 + 20)
-                draw.ellipse([left_up, right_down], fill=(0, 255, 0))
-                frame = np.array(img)
-                video_frame = VideoFrame.from_ndarray(frame, format="rgb24")
-                video_frame.pts = self.frame_count
-                video_frame.time_base = fractions.Fraction(1, 10)
+                video_frame = VideoFrame.from_ndarray(self._blank_frame, format=self.pixel_format)
+                video_frame.pts = self._next_pts
+                video_frame.time_base = _VIDEO_TIME_BASE
+                self._next_pts += 1
                 self.frame_count += 1
                 return video_frame
             except Exception as fallback_error:
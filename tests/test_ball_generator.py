@@ -1,15 +1,18 @@
+import asyncio
 import pytest
 import numpy as np
 from server.ball_generator import BallGenerator
 
-def test_ball_generator_start_stop():
+@pytest.mark.asyncio
+async def test_ball_generator_start_stop():
     gen = BallGenerator(width=320, height=240, fps=5)
     gen.start()
     assert gen.running
     gen.stop()
     assert not gen.running
 
-def test_ball_generator_frame_shape():
+@pytest.mark.asyncio
+async def test_ball_generator_frame_shape():
     gen = BallGenerator(width=100, height=80, fps=2)
     gen.start()
     frame = gen.get_frame()
@@ -17,10 +20,42 @@ def test_ball_generator_frame_shape():
     assert frame.shape == (80, 100, 3)
     gen.stop()
 
-def test_ball_generator_stats():
+def test_ball_generator_yuv420p_frame_shape():
+    gen = BallGenerator(width=100, height=80, pixel_format='yuv420p')
+    frame = gen._create_frame()
+    assert frame.shape == (120, 100)
+    assert gen.get_frame().shape == (120, 100)
+
+@pytest.mark.asyncio
+async def test_ball_generator_stats():
     gen = BallGenerator(width=50, height=50, fps=1)
     gen.start()
     stats = gen.get_stats()
     assert stats['fps'] == 1
     assert stats['resolution'] == (50, 50)
-    gen.stop() 
\ No newline at end of file
+    gen.stop() 
+
+@pytest.mark.asyncio
+async def test_ball_generator_produces_frames_on_event_loop():
+    gen = BallGenerator(width=100, height=80, fps=100)
+    gen.start()
+    await asyncio.sleep(0.05)
+    gen.stop()
+    assert gen.frame_count > 0
+    assert gen.get_frame() is not gen._fallback_frame
+
+@pytest.mark.asyncio
+async def test_ball_generator_skips_unchanged_frames():
+    gen = BallGenerator(width=100, height=80, fps=100)
+    gen._state[:, 2:] = 0
+    gen.start()
+    await asyncio.sleep(0.05)
+    gen.stop()
+    assert gen.frame_count == 1
+
+def test_ball_generator_double_buffers_frames():
+    gen = BallGenerator(width=100, height=80)
+    first = gen._create_frame()
+    second = gen._create_frame()
+    assert not np.shares_memory(first, second)
+    assert gen._create_frame() is first
@@ -1,16 +1,21 @@
 import pytest
 import numpy as np
 import time
+import asyncio
 from server.webrtc_handler import BallVideoTrack
 from av import VideoFrame
 
 class DummyBallGen:
+    pixel_format = 'rgb24'
+    running = True
+    frame_count = 0
+
     def get_frame(self):
         return np.zeros((480, 640, 3), dtype=np.uint8)
 
 def test_ball_video_track_recv(monkeypatch):
     track = BallVideoTrack(DummyBallGen())
-    monkeypatch.setattr(track, 'start_time', time.time() - 1)
+    monkeypatch.setattr(track, 'start_time', time.monotonic() - 1)
     frame = pytest.run(track.recv()) if hasattr(pytest, 'run') else None
     # If pytest.run is not available, just check the method exists
     assert hasattr(track, 'recv') 
@@ -18,11 +23,50 @@ def test_ball_video_track_recv(monkeypatch):
 @pytest.mark.asyncio
 async def test_ball_video_track_recv_returns_frame():
     track = BallVideoTrack(DummyBallGen())
-    track.start_time = time.time() - 1
+    track.start_time = asyncio.get_running_loop().time() - 1
     
     frame = await track.recv()
     
     assert isinstance(frame, VideoFrame)
     assert frame.width == 640
     assert frame.height == 480
-    assert frame.format.name == 'rgb24' 
\ No newline at end of file
+    assert frame.format.name == 'rgb24' 
+
+@pytest.mark.asyncio
+async def test_ball_video_track_skips_copy_for_unchanged_frame():
+    gen = DummyBallGen()
+    track = BallVideoTrack(gen)
+    await track.recv()
+
+    gen.get_frame = lambda: np.full((480, 640, 3), 255, dtype=np.uint8)
+    frame = await track.recv()
+    assert not frame.to_ndarray().any()
+
+    gen.frame_count += 1
+    frame = await track.recv()
+    assert frame.to_ndarray().all()
+
+
+@pytest.mark.asyncio
+async def test_ball_video_track_paces_frames():
+    track = BallVideoTrack(DummyBallGen())
+    loop = asyncio.get_running_loop()
+
+    first = (await track.recv()).pts
+    start = loop.time()
+    second = (await track.recv()).pts
+
+    assert second == first + 1
+    assert loop.time() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_ball_video_track_clears_forced_keyframe():
+    from av.video.frame import PictureType
+
+    track = BallVideoTrack(DummyBallGen())
+    frame = await track.recv()
+    frame.pict_type = PictureType.I
+
+    frame = await track.recv()
+    assert frame.pict_type == PictureType.NONE
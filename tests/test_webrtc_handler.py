@@ -38,17 +38,130 @@ async def test_stream_closed():
 async def test_handle_client_coords_no_ball():
     handler = WebRtcHandler(1, DummyHttp())
     msg = {'x': 10, 'y': 20}
-    await handler.handle_client_coords(msg)
+    handler.handle_client_coords(msg)
 
 @pytest.mark.asyncio
 async def test_handle_client_coords_with_ball():
     handler = WebRtcHandler(1, DummyHttp())
     handler.ball_generator = MagicMock()
-    handler.ball_generator.ball_x = 100
-    handler.ball_generator.ball_y = 150
+    handler.ball_generator.ball_pos = (100, 150)
     
     msg = {'x': 110, 'y': 160}
-    await handler.handle_client_coords(msg)
+    handler.handle_client_coords(msg)
     
     expected_error = ((110 - 100) ** 2 + (160 - 150) ** 2) ** 0.5
-    assert expected_error == 14.142135623730951 
\ No newline at end of file
+    assert expected_error == 14.142135623730951 
+@pytest.mark.asyncio
+async def test_messages_sent_together_share_one_stream():
+    sent = []
+
+    class RecordingHttp(DummyHttp):
+        class _quic:
+            @staticmethod
+            def send_stream_data(stream_id, data, end_stream=True):
+                sent.append(data)
+
+    handler = WebRtcHandler(1, RecordingHttp())
+    handler.handle_client_coords({'x': 1, 'y': 2})
+    handler.handle_client_coords({'x': 3, 'y': 4})
+    await asyncio.sleep(0)
+
+    assert len(sent) == 1
+    messages = json.loads(sent[0])
+    assert [m['client_x'] for m in messages] == [1, 3]
+
+@pytest.mark.asyncio
+async def test_binary_coords_message():
+    from aioquic.h3.events import WebTransportStreamDataReceived
+    from server.webrtc_handler import _COORDS, _COORDS_TAG
+
+    handler = WebRtcHandler(1, DummyHttp())
+    handler.handle_client_coords = MagicMock()
+    handler.h3_event_received(WebTransportStreamDataReceived(
+        data=_COORDS.pack(_COORDS_TAG, 320, -5), session_id=1, stream_ended=True, stream_id=7))
+    await asyncio.sleep(0)
+
+    handler.handle_client_coords.assert_called_once_with({'x': 320, 'y': -5})
+    assert 7 not in handler._stream_buffers
+
+@pytest.mark.asyncio
+async def test_offer_ignored_while_another_is_in_progress():
+    handler = WebRtcHandler(1, DummyHttp())
+    valid_offer = b'{"type": "offer", "sdp": "v=0\\r\\no=- 1234567890 2 IN IP4 127.0.0.1\\r\\ns=-\\r\\nt=0 0\\r\\nm=video 9 UDP/TLS/RTP/SAVPF 96\\r\\n"}'
+    async with handler._offer_lock:
+        await handler.handle_sdp_offer(valid_offer)
+    assert handler.peer_connection is None
+
+@pytest.mark.asyncio
+async def test_wait_for_ice_gathering_removes_listener():
+    from pyee.asyncio import AsyncIOEventEmitter
+
+    pc = AsyncIOEventEmitter()
+    pc.iceGatheringState = 'gathering'
+
+    def complete():
+        pc.iceGatheringState = 'complete'
+        pc.emit('icegatheringstatechange')
+
+    handler = WebRtcHandler(1, DummyHttp())
+    asyncio.get_running_loop().call_soon(complete)
+    await asyncio.wait_for(handler._wait_for_ice_gathering(pc), 1)
+    assert not pc.listeners('icegatheringstatechange')
+
+@pytest.mark.asyncio
+async def test_message_split_across_events():
+    from aioquic.h3.events import WebTransportStreamDataReceived
+    from server.webrtc_handler import _COORDS, _COORDS_TAG
+
+    handler = WebRtcHandler(1, DummyHttp())
+    handler.handle_client_coords = MagicMock()
+    data = _COORDS.pack(_COORDS_TAG, 10, 20)
+    handler.h3_event_received(WebTransportStreamDataReceived(
+        data=data[:4], session_id=1, stream_ended=False, stream_id=9))
+    handler.h3_event_received(WebTransportStreamDataReceived(
+        data=data[4:], session_id=1, stream_ended=True, stream_id=9))
+
+    handler.handle_client_coords.assert_called_once_with({'x': 10, 'y': 20})
+    assert 9 not in handler._stream_buffers
+
+@pytest.mark.asyncio
+async def test_renegotiation_reuses_peer_connection():
+    handler = WebRtcHandler(1, DummyHttp())
+    pc = MagicMock()
+    pc.connectionState = 'connected'
+    pc.iceGatheringState = 'complete'
+    pc.remoteDescription.sdp = 'v=0\r\na=ice-ufrag:abcd\r\n'
+    pc.localDescription.sdp = 'v=0\r\n'
+    pc.setRemoteDescription = AsyncMock()
+    pc.createAnswer = AsyncMock()
+    pc.setLocalDescription = AsyncMock()
+    handler.peer_connection = pc
+    pc2 = MagicMock()
+    pc2.iceGatheringState = 'complete'
+    pc2.localDescription.sdp = 'v=0\r\n'
+    pc2.createAnswer = AsyncMock()
+    pc2.setLocalDescription = AsyncMock()
+
+    async def create_peer_connection(offer):
+        handler.peer_connection = pc2
+        return pc2
+    handler._create_peer_connection = AsyncMock(side_effect=create_peer_connection)
+
+    await handler.handle_sdp_offer(b'{"type": "offer", "sdp": "v=0\\r\\na=ice-ufrag:abcd\\r\\n"}')
+    assert handler.peer_connection is pc
+    pc.setRemoteDescription.assert_awaited_once()
+    handler._create_peer_connection.assert_not_awaited()
+
+    await handler.handle_sdp_offer(b'{"type": "offer", "sdp": "v=0\\r\\na=ice-ufrag:efgh\\r\\n"}')
+    handler._create_peer_connection.assert_awaited_once()
+    assert handler.peer_connection is not pc
+    pc2.setLocalDescription.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_non_stream_events_are_ignored():
+    from aioquic.h3.events import HeadersReceived
+
+    handler = WebRtcHandler(1, DummyHttp())
+    handler.h3_event_received(HeadersReceived(
+        headers=[(b":method", b"CONNECT")], stream_id=1, stream_ended=False))
+    assert handler._stream_buffers == {}